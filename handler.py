@@ -1,17 +1,19 @@
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import json
+import logging
 import os
-import time
 from typing import Any, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
 
 import boto3
 from dateutil import tz
 from dateutil import parser as date_parser
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from gspread.utils import absolute_range_name, rowcol_to_a1
 import requests
+from requests.adapters import HTTPAdapter
 import urllib3
-import xmltodict
 
 
 """
@@ -22,6 +24,7 @@ import xmltodict
         ALERT_ARN arn:sws:sns:...
         GOOGLE_SHEET_ID
         STATIONS {"entry": "entryStationName", "exit": "exitStationName"}
+        LOG_LEVEL (optional) DEBUG for request and full day details; default INFO
 
     Parameters stored in AWS SSM:
         hillbrook-traffic-service-account
@@ -30,25 +33,61 @@ import xmltodict
 """
 
 
+log = logging.getLogger()
+log.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-SNAPS_URL = (
-    "https://satts11.sensysnetworks.net/snaps/dataservice/stats.xml?"
-    + "userName={username}&password={password}&startTime={start_ts}&period={period}&"
-    + "locationGroup={station}"
+SNAPS_URL = "https://satts11.sensysnetworks.net/snaps/dataservice/stats.xml"
+
+PT = tz.gettz("America/Los_Angeles")
+UTC = tz.gettz("UTC")
+# fixed for the life of the container
+STATIONS: Dict[str, str] = json.loads(os.environ["STATIONS"])
+ALERT_ARN = os.environ["ALERT_ARN"]
+GOOGLE_SHEET_ID = os.environ["GOOGLE_SHEET_ID"]
+
+# AWS Parameters and Secrets Lambda Extension; caches parameters across invocations
+_PARAMS_URL = "http://localhost:%s/systemsmanager/parameters/get" % os.environ.get(
+    "PARAMETERS_SECRETS_EXTENSION_HTTP_PORT", "2773"
 )
 
+# created once per container and reused across warm invocations
+_SNS = boto3.client("sns")
+_PARAMS = requests.Session()
+# keep connections to SNAPS alive across requests; one per concurrent fetch
+_SNAPS = requests.Session()
+_SNAPS.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+# opened on first use by get_spreadsheet
+_SPREADSHEET: Optional[gspread.models.Spreadsheet] = None
+
 
 def get_param(name: str) -> str:
-    """Get a parameter from AWS Parameter store."""
-    ssm = boto3.client("ssm")
-    param = ssm.get_parameter(Name=name, WithDecryption=True)
-    return param["Parameter"]["Value"]
+    """Get a parameter from AWS Parameter store.
+
+    In Lambda, read it from the Parameters and Secrets extension's local endpoint,
+    which caches values for SSM_PARAMETER_STORE_TTL seconds (default 300).
+    Elsewhere (running this file directly), call SSM.
+    """
+    if "AWS_LAMBDA_FUNCTION_NAME" not in os.environ:
+        param = boto3.client("ssm").get_parameter(Name=name, WithDecryption=True)
+        return param["Parameter"]["Value"]
+    resp = _PARAMS.get(
+        _PARAMS_URL,
+        params={"name": name, "withDecryption": "true"},
+        headers={"X-Aws-Parameters-Secrets-Token": os.environ["AWS_SESSION_TOKEN"]},
+        timeout=(1, 5),
+    )
+    resp.raise_for_status()
+    return resp.json()["Parameter"]["Value"]
 
 
-def get_counts(station: str, start_ts: int, period: int) -> Dict[str, int]:
+def get_counts(
+    creds: Tuple[str, str], station: str, start_ts: int, period: int
+) -> Dict[str, int]:
     """Get counts for the specified station and time range.
 
+    creds is SNAPS (username, password)
     start_ts is UTC seconds since the epoch
     period is seconds
     return dictionary of station: count
@@ -67,52 +106,57 @@ def get_counts(station: str, start_ts: int, period: int) -> Dict[str, int]:
         </approach>
     </statistics>
     """
-    print("request %s for station %s" % (SNAPS_URL, station))
-    url = SNAPS_URL.format(
-        username=get_param("SNAPS_USERNAME"),
-        password=get_param("SNAPS_PASSWORD"),
-        start_ts=start_ts,
-        period=period,
-        station=station,
+    log.debug(
+        "request %s for station=%s startTime=%s period=%s",
+        SNAPS_URL,
+        station,
+        start_ts,
+        period,
     )
+    params: Dict[str, Any] = {
+        "userName": creds[0],
+        "password": creds[1],
+        "startTime": start_ts,
+        "period": period,
+        "locationGroup": station,
+    }
     # get XML data from SNAPS and parse it
-    resp = requests.get(url, verify=False)
-    data = xmltodict.parse(resp.text)
-    print("data=%s" % data)
-    if "statistics" not in data:
-        print("error: bad data: %s" % data)
+    # (connect, read) timeouts so a stalled SNAPS doesn't hang the Lambda
+    # verify is set per request: a session-level verify=False is overridden
+    # when REQUESTS_CA_BUNDLE or CURL_CA_BUNDLE is set in the environment
+    resp = _SNAPS.get(SNAPS_URL, params=params, verify=False, timeout=(3, 10))
+    try:
+        root: Optional[ElementTree.Element] = ElementTree.fromstring(resp.content)
+    except ElementTree.ParseError:
+        root = None
+    if root is None or root.tag != "statistics":
+        log.warning("bad data: %s", resp.text)
         # notify once an hour during school hours
-        now_pt = datetime.now(tz.gettz("America/Los_Angeles"))
+        now_pt = datetime.now(PT)
         if (
             now_pt.weekday() < 5
             and now_pt.minute < 15
             and now_pt.hour >= 7
             and now_pt.hour <= 17
         ):
-            print(
-                boto3.client("sns").publish(
-                    TopicArn=os.environ["ALERT_ARN"],
-                    Message="received bad data from SNAPS:\n\n%s" % resp.text,
-                    Subject="error loading traffic data",
-                )
+            response = _SNS.publish(
+                TopicArn=ALERT_ARN,
+                Message="received bad data from SNAPS:\n\n%s" % resp.text,
+                Subject="error loading traffic data",
             )
+            log.info("sent error alert: %s", response)
         else:
-            print("skipping error alert: outside of alert range", now_pt)
+            log.info("skipping error alert: outside of alert range %s", now_pt)
 
         return {}
 
-    values: Dict[str, int] = {}
-    print("start: empty values=%s" % values)
-    for lane in data["statistics"]["approach"]["lanes"]["lane"]:
-        name = lane["@name"]
-        values[name] = int(lane["stat"]["@volume"])
-        print(
-            "lane %s=%s values=%s values[%s]=%s"
-            % (name, int(lane["stat"]["@volume"]), values, name, values[name])
-        )
-    print(
-        "station=%s startTime=%s period=%s values=%s"
-        % (station, start_ts, period, values)
+    values = {
+        lane.attrib["name"]: int(stat.attrib["volume"])
+        for lane in root.iterfind("./approach/lanes/lane")
+        for stat in lane.iterfind("stat")
+    }
+    log.info(
+        "station=%s startTime=%s period=%s values=%s", station, start_ts, period, values
     )
     return values
 
@@ -120,29 +164,56 @@ def get_counts(station: str, start_ts: int, period: int) -> Dict[str, int]:
 def get_spreadsheet() -> gspread.models.Spreadsheet:
     """Use gspread to open the Google sheet using the service account credentials.
 
+    The spreadsheet is opened once per container and reused by warm invocations.
+    Its client is a google-auth AuthorizedSession, which keeps connections to the
+    Google APIs alive and refreshes the access token when it expires.
     gspread docs: https://gspread.readthedocs.io/en/latest/
     """
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
+    global _SPREADSHEET
+    if _SPREADSHEET:
+        return _SPREADSHEET
     creds = json.loads(get_param("hillbrook-traffic-service-account"))
-    credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds, scope)
-    client = gspread.authorize(credentials)
-    return client.open_by_key(os.environ["GOOGLE_SHEET_ID"])
+    client = gspread.service_account_from_dict(creds)
+    _SPREADSHEET = client.open_by_key(GOOGLE_SHEET_ID)
+    return _SPREADSHEET
 
 
-def full_day_from_sheet(sheet_name: str, as_of: datetime):
-    ss = get_spreadsheet()
-    sheet = ss.worksheet(sheet_name)
-    # column B for row matching date
-    dt_cell = sheet.find(as_of.strftime("%m/%d/%y"))
-    if not dt_cell:
+def full_day_from_sheet(
+    ss: gspread.models.Spreadsheet, sheet_name: str, as_of: datetime
+) -> int:
+    """Get the total count for as_of's date from the counts in sheet_name.
+
+    Reads column A to find the row for the date, then only the cells from the
+    first count up to as_of.
+    """
+    column = ss.values_get(
+        absolute_range_name(sheet_name, "A:A"), params={"majorDimension": "COLUMNS"}
+    )
+    dates = column.get("values", [[]])[0]
+    try:
+        row = dates.index(as_of.strftime("%m/%d/%y")) + 1
+    except ValueError:
         return -1
     # 4 per hour starting at 5am, plus 2 for date and total
     max_col = (as_of.hour - 5) * 4 + int(as_of.minute / 15) + 2
-    values = sheet.row_values(dt_cell.row)[2:max_col]
-    return sum([int(v) for v in values])
+    cells = ss.values_get(
+        absolute_range_name(sheet_name, "C%s:%s" % (row, rowcol_to_a1(row, max_col)))
+    )
+    values = (cells.get("values") or [[]])[0]
+    return sum([int(v) for v in values if v])
+
+
+# 4pm and 5pm: hour: (coef, intercept)
+_PREDICTION_COEFS = {
+    16: (1.01649594, 44.91931545628796),
+    17: (1.00662224, 17.955353264565133),
+}
+# 1pm Mon-Wed: day: threshold
+_PREDICTION_THRESHOLDS = {
+    0: 222,
+    1: 220,
+    2: 211,
+}
 
 
 def _prediction(now_pt: datetime, observed: int) -> int:
@@ -155,25 +226,16 @@ def _prediction(now_pt: datetime, observed: int) -> int:
     1pm:
       use threshold for Mon-Wed; don't predict for Thu-Fri
     """
-    hour = now_pt.hour
-    if hour in [16, 17]:
-        # (coef, intercept)
-        calc = {
-            16: (1.01649594, 44.91931545628796),
-            17: (1.00662224, 17.955353264565133),
-        }
-        return int(round(float(observed) * calc[hour][0] + calc[hour][1]))
-    # 1pm Mon-Wed: day: threshold
-    by_day = {
-        0: 222,
-        1: 220,
-        2: 211,
-    }
-    weekday = now_pt.weekday()
-    if weekday not in by_day:
+    calc = _PREDICTION_COEFS.get(now_pt.hour)
+    if calc:
+        return int(round(observed * calc[0] + calc[1]))
+    if now_pt.hour != 13:
+        return 0
+    threshold = _PREDICTION_THRESHOLDS.get(now_pt.weekday())
+    if threshold is None:
         return 0
     # high or not; not a specific prediction
-    return 401 if observed >= by_day[weekday] else 0
+    return 401 if observed >= threshold else 0
 
 
 def send_alert(values: Dict[str, int], now_pt: datetime, send=True):
@@ -204,103 +266,190 @@ def send_alert(values: Dict[str, int], now_pt: datetime, send=True):
             values["predicted"],
         )
     if send:
-        print(
-            boto3.client("sns").publish(
-                TopicArn=os.environ["ALERT_ARN"], Message=message, Subject=subject
-            )
-        )
+        response = _SNS.publish(TopicArn=ALERT_ARN, Message=message, Subject=subject)
+        log.info("sent alert: %s", response)
     else:
-        print("alert:\n\t%s\n\t%s" % (subject, message))
+        log.info("alert:\n\t%s\n\t%s", subject, message)
+
 
+# sheets: display Exit, display Entry, prediction, EntryA, EntryB, ExitA, ExitB
+_PREDICTION_SHEET = 2
+# lane, station type, worksheet index
+_LANES = [
+    ("EntryA", "entry", 3),
+    ("EntryB", "entry", 4),
+    ("ExitA", "exit", 5),
+    ("ExitB", "exit", 6),
+]
 
-def update_sheet(values: Dict[str, Dict[str, Any]], now_pt: datetime, write: bool):
+
+def _parse_sheet_date(value: str) -> date:
+    """Parse a date from column A of a sheet.
+
+    Dates are written as m/d/yy, so try the known formats with strptime before
+    falling back to dateutil's much slower general-purpose parser.
+    """
+    for fmt in ["%m/%d/%y", "%m/%d/%Y"]:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            pass
+    return date_parser.parse(value).date()
+
+
+def update_sheet(
+    ss: gspread.models.Spreadsheet,
+    values: Dict[str, Dict[str, Any]],
+    now_pt: datetime,
+    write: bool,
+):
     """Update sheet with measured values.
 
-    If write is true, update the spreadsheet; otherwise print updates.
+    If write is true, update the spreadsheet; otherwise log updates.
     values looks like {
         'entry': {'EntryA': 0, 'EntryB': 0, 'prediction': {'actual': 250, 'predicted': 299}},
         'exit': {'ExitA': 0, 'ExitB': 0}}
+    Dates in A2 are read with a single batch get. At the end, rows for a new day
+    are inserted with one batch update and all values are written with one
+    values batch update.
     """
-    # setup sheet
-    ss = get_spreadsheet()
     # 4 per hour starting at 5am, plus 2 for date and total
     col = (now_pt.hour - 5) * 4 + int(now_pt.minute / 15) + 2
-    # sheets: display Exit, display Entry, prediction, EntryA, EntryB, ExitA, ExitB
-    worksheets = {"prediction": 2, "EntryA": 3, "EntryB": 4, "ExitA": 5, "ExitB": 6}
+    sheets = ss.worksheets()
+    # first date (A2) on the prediction sheet and each lane's sheet
+    indexes = [_PREDICTION_SHEET] + [idx for _, _, idx in _LANES]
+    ranges = [absolute_range_name(sheets[idx].title, "A2") for idx in indexes]
+    value_ranges = ss.values_batch_get(ranges)["valueRanges"]
+    dates = {
+        idx: (vr.get("values") or [[""]])[0][0]
+        for idx, vr in zip(indexes, value_ranges)
+    }
+    # requests to insert an empty row 2, for sheets without a row for today
+    inserts: List[Dict[str, Any]] = []
+    # cell updates to send in one batch: [{'range': "'EntryA'!D2", 'values': [[3]]}]
+    updates: List[Dict[str, Any]] = []
     mdy = now_pt.strftime("%-m/%-d/%y")
-    prefix = {0: "", 1: "A", 2: "B"}  # A-Z, AA-AZ, BA-BZ
-    for key in ["EntryA", "EntryB", "ExitA", "ExitB"]:
-        value_key = "entry" if "Entry" in key else "exit"
-        if value_key in values:
-            val = max(0, values["entry" if "Entry" in key else "exit"].get(key, 0))
-        else:
-            val = 0
-        sheet = ss.get_worksheet(worksheets[key])
-        dt_str = sheet.range("A2:A2")[0].value or datetime.now().strftime("%m/%d/%Y")
-        latest = date_parser.parse(dt_str).date()
+    # start of a new day's row, up to the current cell; cells after it are left empty
+    new_row: List[Any] = [mdy, "=sum(c2:bf2)"] + [""] * (col - 2)
+    for key, station_type, idx in _LANES:
+        val = max(0, values.get(station_type, {}).get(key, 0))
+        sheet = sheets[idx]
+        dt_str = dates[idx] or datetime.now().strftime("%m/%d/%Y")
+        latest = _parse_sheet_date(dt_str)
         if now_pt.date() == latest:
             # row for this day already exists; update cell
-            cell = "%s%s2" % (prefix[int(col / 26)], chr(65 + col % 26))
-            print("%s: updating %s = %s" % (sheet.title, cell, val))
-            if write:
-                sheet.update_acell(cell, val)
-            else:
-                print("dry run:\tupdate cell %s = %s" % (cell, val))
+            # col is a 0-based index into the row; A1 columns start at 1
+            cell = rowcol_to_a1(2, col + 1)
+            log.info("%s: updating %s = %s", sheet.title, cell, val)
+            updates.append(
+                {"range": absolute_range_name(sheet.title, cell), "values": [[val]]}
+            )
         else:
             # add row with date and total
-            print("%s: inserting %s %s" % (sheet.title, mdy, val))
-            row: List[Any] = [mdy, "=sum(c2:bf2)"] + [""] * 56
-            row[col] = val
-            if write:
-                sheet.insert_row(row, index=2, value_input_option="USER_ENTERED")
-            else:
-                print("dry run:\tinsert row: %s" % row)
+            log.info("%s: inserting %s %s", sheet.title, mdy, val)
+            inserts.append(_insert_row_request(sheet))
+            updates.append(
+                {
+                    "range": absolute_range_name(sheet.title, "A2"),
+                    "values": [new_row + [val]],
+                }
+            )
 
     # prediction': {'actual': 250, 'predicted': 299}
     # without predicted at end of day
     prediction: Dict[str, int] = values.get("entry", {}).get("prediction", {})
     if not prediction:
-        print("no prediction")
-        return
-    # end of day has actual but not predicted; save only if it's high
-    if "predicted" not in prediction and prediction["actual"] < 400:
-        print(
-            "end of day low (%s); not writing to prediction sheet"
-            % prediction["actual"]
+        log.info("no prediction")
+    elif "predicted" not in prediction and prediction["actual"] < 400:
+        # end of day has actual but not predicted; save only if it's high
+        log.info(
+            "end of day low (%s); not writing to prediction sheet", prediction["actual"]
         )
+    else:
+        prediction_inserts, prediction_updates = _prediction_updates(
+            sheets[_PREDICTION_SHEET], dates[_PREDICTION_SHEET], prediction, now_pt
+        )
+        inserts += prediction_inserts
+        updates += prediction_updates
+
+    if not updates:
         return
+    if write:
+        # rows must exist before values are written to them
+        if inserts:
+            ss.batch_update({"requests": inserts})
+        ss.values_batch_update(
+            body={"valueInputOption": "USER_ENTERED", "data": updates}
+        )
+    else:
+        for insert in inserts:
+            log.info("dry run:\tinsert %s", insert)
+        for update in updates:
+            log.info("dry run:\tupdate %s = %s", update["range"], update["values"])
+
+
+def _insert_row_request(sheet: gspread.models.Worksheet) -> Dict[str, Any]:
+    """Get a batch_update request that inserts an empty row 2 in sheet."""
+    return {
+        "insertDimension": {
+            "range": {
+                "sheetId": sheet.id,
+                "dimension": "ROWS",
+                "startIndex": 1,
+                "endIndex": 2,
+            }
+        }
+    }
+
+
+def _prediction_updates(
+    sheet: gspread.models.Worksheet,
+    dt_str: str,
+    prediction: Dict[str, int],
+    now_pt: datetime,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Get row inserts and cell updates for the prediction sheet.
+
+    A row for today is added if needed; dt_str is the current value of A2.
+    Returns (requests for batch_update, updates for values_batch_update).
+    """
     # A     B      C           D              E           F              G           H
     # date, total, 1pm actual, 1pm predicted, 4pm actual, 4pm predicted, 5pm actual, 5pm predicted
     hour_col = {1: ("C", "D"), 16: ("E", "F"), 17: ("G", "H"), 18: ("B", None)}
     col_idx: Optional[Tuple[str, Optional[str]]] = hour_col.get(now_pt.hour, None)
     if not col_idx:
-        print("invalid hour for prediction sheet: %s" % now_pt.hour)
-        return
-    sheet = ss.get_worksheet(worksheets["prediction"])
-    latest = date_parser.parse(sheet.range("A2:A2")[0].value).date()
+        log.warning("invalid hour for prediction sheet: %s", now_pt.hour)
+        return [], []
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    mdy = now_pt.strftime("%-m/%-d/%y")
+    latest = _parse_sheet_date(dt_str)
     if now_pt.date() != latest:
         # add row with date and total
-        print("prediction: inserting row=2: %s" % (val))
+        log.info("prediction: inserting row=2: %s", mdy)
         row = [mdy, "=VLOOKUP(A2, EntryA!A:B, 2, FALSE)"]
-        if write:
-            sheet.insert_row(row, index=2, value_input_option="USER_ENTERED")
-        else:
-            print("dry run:\tprediction insert row: %s" % row)
+        inserts.append(_insert_row_request(sheet))
+        updates.append(
+            {"range": absolute_range_name(sheet.title, "A2"), "values": [row]}
+        )
     if "predicted" not in prediction:
-        return
-    # row for this day already exists; update cell
-    print(
-        "prediction: updating row=2 col=%s: actual=%s predicted=%s"
-        % (col_idx, prediction["actual"], prediction["predicted"])
+        return inserts, updates
+    # row for this day already exists; update cells
+    log.info(
+        "prediction: updating row=2 col=%s: actual=%s predicted=%s",
+        col_idx,
+        prediction["actual"],
+        prediction["predicted"],
     )
-    if write:
-        sheet.update_acell("%s2" % col_idx[0], prediction["actual"])
-        sheet.update_acell("%s2" % col_idx[1], prediction["predicted"])
-    else:
-        print("dry run:\tprediction update %s2 = %s" % (col_idx[0], prediction["actual"]))
-        print(
-            "dry run:\tprediction update %s2 = %s" % (col_idx[1], prediction["predicted"])
-        )
+    updates.append(
+        {
+            "range": absolute_range_name(
+                sheet.title, "%s2:%s2" % (col_idx[0], col_idx[1])
+            ),
+            "values": [[prediction["actual"], prediction["predicted"]]],
+        }
+    )
+    return inserts, updates
 
 
 def collect_to_sheet(event, context):
@@ -308,31 +457,24 @@ def collect_to_sheet(event, context):
 
     event and context are provided by AWS Lambda.
     """
-    # start 20 minutes ago, in UTC
-    start = datetime.now() - timedelta(minutes=20)
-    start.replace(second=0, microsecond=0)
-    start_ts = int(time.mktime(start.timetuple()))
-    # 15 minutes in seconds
-    period = 15 * 60
-    # start of Pacfic time day
-    pt_tz = tz.gettz("America/Los_Angeles")
+    # read the clock once; everything else derives from it
+    now = datetime.now(UTC)
     # if running for a specific date (for testing)
     if event.get("dt", None):
-        now_pt = date_parser.parse(event["dt"]).replace(tzinfo=pt_tz)
-        day_start = date_parser.parse(event["dt"]).replace(tzinfo=pt_tz)
-        print("running for %s" % now_pt)
+        now_pt = date_parser.parse(event["dt"]).replace(tzinfo=PT)
+        log.info("running for %s", now_pt)
     else:
-        now_pt = datetime.now(pt_tz)
-        day_start = datetime.now(pt_tz)
-    day_start = day_start.replace(hour=0, minute=0, second=0)
-    day_start_ts = int(time.mktime(day_start.astimezone(tz.gettz("UTC")).timetuple()))
-    # seconds between start of day and 5 minutes ago
-    day_period = now_pt.hour * 3600 + now_pt.minute * 60 + now_pt.second - 5 * 60
+        now_pt = now.astimezone(PT)
     # sheet columns: date total 5:10 AM 5:25 AM 5:40 AM..
     # get column for this data point
     if now_pt.hour < 5 or now_pt.hour > 18:
-        print(now_pt, " outside data collection range")
+        log.info("%s outside data collection range", now_pt)
         return
+    # start 20 minutes ago, in UTC
+    start = (now - timedelta(minutes=20)).replace(second=0, microsecond=0)
+    start_ts = int(start.timestamp())
+    # 15 minutes in seconds
+    period = 15 * 60
     # predictions M-F at 4pm and 5pm, M-W at 1pm
     predict = False
     if now_pt.weekday() < 5 and now_pt.minute < 15:
@@ -341,45 +483,67 @@ def collect_to_sheet(event, context):
         if now_pt.hour == 13 and now_pt.weekday() in [0, 1, 2]:
             predict = True
     full_day = now_pt.hour > 17
+    if predict or full_day:
+        # start of Pacfic time day
+        day_start = now_pt.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start_ts = int(day_start.timestamp())
+        # seconds between start of day and 5 minutes ago
+        day_period = now_pt.hour * 3600 + now_pt.minute * 60 + now_pt.second - 5 * 60
     alert_key = "EntryA"
     # get data from SNAPS
     values = {
         "startTime": start_ts,
         "period": period,
-        "time": datetime.now(tz.gettz("America/Los_Angeles")).strftime("%H%M%S"),
+        "time": now.astimezone(PT).strftime("%H%M%S"),
     }
-    stations = json.loads(os.environ["STATIONS"])
-    for station_type in stations:
-        print("\nstation %s" % station_type)
-        # 15 minutes of data starting 20 minutes ago
-        values[station_type] = get_counts(stations[station_type], start_ts, period)
+    # look up once for all requests
+    creds = (get_param("SNAPS_USERNAME"), get_param("SNAPS_PASSWORD"))
+    # 15 minutes of data starting 20 minutes ago for each station
+    jobs = [(STATIONS[station_type], start_ts, period) for station_type in STATIONS]
+    if predict or full_day:
+        # full day counts up to 5 minutes ago for each station
+        jobs += [
+            (STATIONS[station_type], day_start_ts, day_period)
+            for station_type in STATIONS
+        ]
+    # SNAPS requests are independent; wait for the slowest instead of the sum
+    # open the sheet at the same time (slow on a cold start)
+    with ThreadPoolExecutor(max_workers=len(jobs) + 1) as executor:
+        ss_future = executor.submit(get_spreadsheet)
+        counts = list(executor.map(lambda job: get_counts(creds, *job), jobs))
+        ss = ss_future.result()
+    for idx, station_type in enumerate(STATIONS):
+        log.debug("station %s", station_type)
+        values[station_type] = counts[idx]
         if not predict and not full_day:
-            print(
-                "skipping prediction: hour=%s weekday=%s minute=%s"
-                % (now_pt.hour, now_pt.weekday(), now_pt.minute)
+            log.info(
+                "skipping prediction: hour=%s weekday=%s minute=%s",
+                now_pt.hour,
+                now_pt.weekday(),
+                now_pt.minute,
             )
             continue
-        # get full day counts up to 5 minutes ago
         # this seems to be unreliable, often returning -1
-        day = get_counts(stations[station_type], day_start_ts, day_period)
-        print(
-            "hour=%s start=%s (%s) period=%s full day=%s"
-            % (
-                now_pt.hour,
-                day_start_ts,
-                datetime.fromtimestamp(day_start_ts),
-                day_period,
-                day,
-            )
+        day = counts[len(STATIONS) + idx]
+        log.debug(
+            "hour=%s start=%s (%s) period=%s full day=%s",
+            now_pt.hour,
+            day_start_ts,
+            datetime.fromtimestamp(day_start_ts),
+            day_period,
+            day,
         )
         day_count = day.get(alert_key, -1)
         if day_count < 0:
-            print("bad data for full day: %s = %s" % (alert_key, day))
+            log.warning("bad data for full day: %s = %s", alert_key, day)
             # try to get from sheet
-            day_count = full_day_from_sheet(alert_key, now_pt) or -1
-            print("full day count from sheet = %s" % day_count)
+            day_count = full_day_from_sheet(ss, alert_key, now_pt) or -1
+            log.info("full day count from sheet = %s", day_count)
         if day_count < 150:
-            print("actual %s; not enough for a prediction (likely not a school day)" % day_count)
+            log.info(
+                "actual %s; not enough for a prediction (likely not a school day)",
+                day_count,
+            )
             continue
         values[station_type]["prediction"] = {
             "actual": day_count,
@@ -387,19 +551,20 @@ def collect_to_sheet(event, context):
         if not predict:
             continue
         predicted = _prediction(now_pt, day_count)
-        print("predicted=%s" % predicted)
+        log.info("predicted=%s", predicted)
         if predicted:
             values[station_type]["prediction"]["predicted"] = predicted
         else:
-            print("no prediction available for %s %s" % (now_pt.hour, day))
+            log.info("no prediction available for %s %s", now_pt.hour, day)
 
     # send to sheet
-    print("\nvalues=%s" % values)
-    update_sheet(values, now_pt, event.get("write", True))
+    log.info("values=%s", values)
+    update_sheet(ss, values, now_pt, event.get("write", True))
     send_alert(
         values.get("entry", {}).get("prediction", {}), now_pt, event.get("alert", True)
     )
 
 
 if __name__ == "__main__":
+    logging.basicConfig()
     collect_to_sheet({"write": False, "alert": False, "dt": "2020-09-18 15:10"}, {})